@@ -2,6 +2,8 @@
 import cdsapi
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # ==============================================================================
 # INSTRUÇÕES DE USO:
@@ -42,30 +44,54 @@ SST_AREA = [
 ]
 SST_VARIABLE = ['sea_surface_temperature']
 
-def download_era5_data(client):
-    """Baixa dados de reanálise ERA5 para Uberlândia e SST do Atlântico Sul."""
-    print("Iniciando download dos dados ERA5 para Uberlândia...")
-    
+# Limite de requisições simultâneas por usuário na CDS API
+MAX_CONCURRENT_REQUESTS = 3
+
+# Cada thread usa seu próprio cdsapi.Client, pois o cliente não é
+# documentado como thread-safe.
+_thread_local = threading.local()
+
+def _get_client():
+    """Retorna o cdsapi.Client da thread atual, criando-o se necessário."""
+    if not hasattr(_thread_local, 'client'):
+        _thread_local.client = cdsapi.Client()
+    return _thread_local.client
+
+def _retrieve_job(dataset, request, target):
+    """Executa uma requisição client.retrieve e retorna o nome do arquivo gerado."""
+    _get_client().retrieve(dataset, request, target)
+    return target
+
+def build_era5_jobs():
+    """Monta as requisições ERA5 para Uberlândia e SST do Atlântico Sul."""
+    jobs = []
+
     # 1. Dados Locais (Uberlândia)
-    client.retrieve(
-        'reanalysis-era5-single-levels',
-        {
-            'product_type': 'reanalysis',
-            'format': 'netcdf',
-            'variable': ERA5_VARIABLES,
-            'year': '2020',
-            'month': ['01', '02', '03', '04', '05', '06', '07', '08', '09', '10', '11', '12'],
-            'day': [f'{i:02d}' for i in range(1, 32)],
-            'time': ['12:00'], # Exemplo: 12h UTC
-            'area': UBERLANDIA_AREA,
-        },
-        'era5_uberlandia_2020.nc'
-    )
-    print("Download de era5_uberlandia_2020.nc concluído.")
+    # Uma requisição por mês em vez de um único job anual: a fila da CDS
+    # processa os sub-jobs em paralelo e, em caso de falha parcial, apenas
+    # os meses faltantes precisam ser baixados novamente.
+    for month in range(1, 13):
+        target = f'era5_uberlandia_2020_{month:02d}.nc'
+        if os.path.exists(target):
+            print(f"Arquivo {target} já existe, pulando.")
+            continue
+        jobs.append((
+            'reanalysis-era5-single-levels',
+            {
+                'product_type': 'reanalysis',
+                'format': 'netcdf',
+                'variable': ERA5_VARIABLES,
+                'year': '2020',
+                'month': [f'{month:02d}'],
+                'day': [f'{i:02d}' for i in range(1, 32)],
+                'time': ['12:00'], # Exemplo: 12h UTC
+                'area': UBERLANDIA_AREA,
+            },
+            target
+        ))
 
     # 2. Dados de Teleconexão (SST Atlântico Sul)
-    print("Iniciando download dos dados SST do Atlântico Sul...")
-    client.retrieve(
+    jobs.append((
         'reanalysis-era5-single-levels',
         {
             'product_type': 'reanalysis',
@@ -78,16 +104,17 @@ def download_era5_data(client):
             'area': SST_AREA,
         },
         'era5_sst_atlantic_2020.nc'
-    )
-    print("Download de era5_sst_atlantic_2020.nc concluído.")
+    ))
 
+    return jobs
+
+
+def build_cmip6_jobs():
+    """Monta as requisições CMIP6 para os cenários SSP2-4.5 e SSP5-8.5."""
+    jobs = []
 
-def download_cmip6_data(client):
-    """Baixa dados de projeção CMIP6 para cenários SSP2-4.5 e SSP5-8.5."""
-    print("\nIniciando download dos dados CMIP6 (SSP2-4.5 e SSP5-8.5)...")
-    
     # Exemplo de requisição para o cenário SSP2-4.5
-    client.retrieve(
+    jobs.append((
         'projections-cmip6',
         {
             'format': 'netcdf',
@@ -100,11 +127,10 @@ def download_cmip6_data(client):
             'area': UBERLANDIA_AREA,
         },
         'cmip6_ssp245_uberlandia_2040_2041.nc'
-    )
-    print("Download de cmip6_ssp245_uberlandia_2040_2041.nc concluído.")
+    ))
 
     # Exemplo de requisição para o cenário SSP5-8.5
-    client.retrieve(
+    jobs.append((
         'projections-cmip6',
         {
             'format': 'netcdf',
@@ -117,19 +143,52 @@ def download_cmip6_data(client):
             'area': UBERLANDIA_AREA,
         },
         'cmip6_ssp585_uberlandia_2040_2041.nc'
-    )
-    print("Download de cmip6_ssp585_uberlandia_2040_2041.nc concluído.")
+    ))
+
+    return jobs
+
+
+def merge_era5_monthly_files(output_file='era5_uberlandia_2020.nc'):
+    """Concatena os arquivos mensais ERA5 no arquivo anual único."""
+    import glob
+
+    import xarray as xr
+
+    monthly_files = sorted(glob.glob('era5_uberlandia_2020_*.nc'))
+    if not monthly_files:
+        print("Nenhum arquivo mensal encontrado para concatenar.")
+        return
+
+    # parallel=True lê os arquivos via threadpool do Dask; o engine
+    # h5netcdf libera o GIL nas leituras, então elas sobrepõem de fato
+    with xr.open_mfdataset(monthly_files, combine='by_coords', parallel=True,
+                           engine='h5netcdf') as ds:
+        ds.to_netcdf(output_file)
+    print(f"Arquivos mensais concatenados em {output_file}.")
 
 
 if __name__ == '__main__':
     try:
-        # Inicializa o cliente CDS API
-        c = cdsapi.Client()
-        
-        # Executa os downloads
-        download_era5_data(c)
-        download_cmip6_data(c)
-        
+        # As requisições são submetidas em paralelo: a espera na fila da CDS é
+        # puramente I/O-bound, então sobrepor as esperas reduz o tempo total.
+        # O limite de 3 workers respeita o teto de requisições simultâneas.
+        jobs = build_era5_jobs() + build_cmip6_jobs()
+
+        print(f"Submetendo {len(jobs)} requisições à CDS API "
+              f"(até {MAX_CONCURRENT_REQUESTS} em paralelo)...")
+
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+            futures = {
+                executor.submit(_retrieve_job, dataset, request, target): target
+                for dataset, request, target in jobs
+            }
+            for future in as_completed(futures):
+                # Propaga imediatamente qualquer falha de download
+                print(f"Download de {future.result()} concluído.")
+
+        # Reconstrói o arquivo anual esperado pelo pré-processamento
+        merge_era5_monthly_files()
+
         print("\nTodos os downloads foram solicitados com sucesso.")
         print("Os arquivos .nc (NetCDF) estão prontos para processamento.")
 
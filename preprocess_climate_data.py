@@ -2,7 +2,10 @@
 import xarray as xr
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
+import numexpr as ne
+import bottleneck as bn
+import joblib
+from numba import njit, prange
 import os
 
 """
@@ -12,18 +15,33 @@ SCRIPT DE PRÉ-PROCESSAMENTO: ERA5/CMIP6 PARA QUANTUM MACHINE LEARNING
 Este script processa os arquivos NetCDF (.nc) baixados via CDS API, realiza
 o feature engineering necessário e prepara os dados para o ZZFeatureMap.
 
-Dependências: pip install xarray netCDF4 pandas numpy scikit-learn
+Dependências: pip install xarray h5netcdf dask pandas numpy numexpr numba bottleneck
 ==============================================================================
 """
 
 def calculate_relative_humidity(t2m, d2m):
     """Calcula a umidade relativa aproximada usando a fórmula de Magnus-Tetens."""
     # t2m e d2m em Kelvin
-    T = t2m - 273.15
-    TD = d2m - 273.15
-    rh = 100 * (np.exp((17.625 * TD) / (243.04 + TD)) / np.exp((17.625 * T) / (243.04 + T)))
+    # numexpr funde as exponenciais e divisões em uma única passada pelos
+    # dados (sem arrays temporários), com kernels multi-threaded
+    rh = ne.evaluate(
+        "100 * exp((17.625 * (d2m - 273.15)) / (243.04 + (d2m - 273.15)))"
+        " / exp((17.625 * (t2m - 273.15)) / (243.04 + (t2m - 273.15)))",
+        local_dict={'t2m': np.asarray(t2m), 'd2m': np.asarray(d2m)},
+    )
+    if isinstance(t2m, pd.Series):
+        rh = pd.Series(rh, index=t2m.index)
     return rh
 
+@njit(parallel=True, fastmath=True, cache=True)
+def affine_scale(X, mn, scale):
+    """Aplica (x - mn) * scale por coluna em um kernel Numba fundido."""
+    out = np.empty_like(X)
+    for i in prange(X.shape[0]):
+        for j in range(X.shape[1]):
+            out[i, j] = (X[i, j] - mn[j]) * scale[j]
+    return out
+
 def preprocess_data(era5_file, sst_file):
     """Lê arquivos NetCDF e prepara o DataFrame final."""
     print(f"Processando arquivos: {era5_file} e {sst_file}")
@@ -33,31 +51,46 @@ def preprocess_data(era5_file, sst_file):
         return None
 
     # 1. Carregar dados de Uberlândia
-    ds_uber = xr.open_dataset(era5_file)
+    # chunks={'time': 744} (um mês de dados horários) carrega via Dask de
+    # forma lazy: a média espacial é calculada em streaming, chunk a chunk,
+    # em vez de materializar o NetCDF inteiro na memória.
+    # engine='h5netcdf' libera o GIL durante as leituras HDF5, permitindo
+    # que os threads do Dask realmente sobreponham I/O
+    ds_uber = xr.open_dataset(era5_file, engine='h5netcdf', chunks={'time': 744})
     # Extrair médias espaciais se houver mais de um ponto na grade
-    df_uber = ds_uber.mean(dim=['latitude', 'longitude']).to_dataframe()
-    
-    # 2. Calcular Umidade Relativa
-    if 't2m' in df_uber.columns and 'd2m' in df_uber.columns:
-        df_uber['relative_humidity'] = calculate_relative_humidity(df_uber['t2m'], df_uber['d2m'])
-    
+    ds_uber = ds_uber.mean(dim=['latitude', 'longitude']).compute()
+
+    # 2. Calcular Umidade Relativa (apply_ufunc opera direto nos arrays)
+    if 't2m' in ds_uber and 'd2m' in ds_uber:
+        ds_uber['relative_humidity'] = xr.apply_ufunc(
+            calculate_relative_humidity, ds_uber['t2m'], ds_uber['d2m'])
+
     # 3. Carregar dados de SST (Teleconexão)
-    ds_sst = xr.open_dataset(sst_file)
-    df_sst = ds_sst.mean(dim=['latitude', 'longitude']).to_dataframe()
-    
-    # 4. Integrar DataFrames (Join pelo tempo)
-    # Nota: Pode ser necessário ajustar a frequência (ex: resample para mensal)
-    df_final = df_uber.join(df_sst[['sst']], how='inner', rsuffix='_ocean')
-    
-    # 5. Seleção de Features para o Modelo Quântico (4 Features para 4 Qubits)
+    ds_sst = xr.open_dataset(sst_file, engine='h5netcdf').mean(dim=['latitude', 'longitude'])
+
+    # 4. Integrar pelo tempo: a SST é mensal enquanto o ERA5 é diário.
+    # Em vez de um merge 'inner' que só mantém os timestamps coincidentes
+    # (descartando quase todas as amostras), propagamos o valor mensal
+    # (forward-fill) para cada timestamp do ERA5 — uma busca linear sobre
+    # os dois índices ordenados, O(N+M)
+    ds = ds_uber
+    ds['sst'] = ds_sst['sst'].reindex(time=ds_uber['time'], method='ffill')
+
+    # 5. Definição do Target (Anomalia Térmica)
+    # Exemplo: 1 se a temperatura estiver 2 desvios padrão acima da média.
+    # As reduções usam os kernels C do bottleneck (nanmean/nanstd), mais
+    # rápidos que o caminho com checagem de NaN do pandas/xarray
+    t2m_arr = ds['t2m'].values
+    threshold = bn.nanmean(t2m_arr) + 2 * bn.nanstd(t2m_arr)
+    target = (ds['t2m'] > threshold).astype('int8')
+
+    # 6. Seleção de Features para o Modelo Quântico (4 Features para 4 Qubits)
+    # Só aqui convertemos para DataFrame, já com as séries 1-D reduzidas
     features = ['sst', 'relative_humidity', 'sp', 'ssrd'] # SST, Umidade, Pressão, Radiação
-    df_model = df_final[features].dropna()
-    
-    # 6. Definição do Target (Anomalia Térmica)
-    # Exemplo: 1 se a temperatura estiver 2 desvios padrão acima da média
-    threshold = df_final['t2m'].mean() + 2 * df_final['t2m'].std()
-    df_model['target'] = (df_final['t2m'] > threshold).astype(int)
-    
+    df_model = ds[features].to_dataframe()
+    df_model['target'] = target.values
+    df_model = df_model.dropna(subset=features)
+
     print(f"Dataset processado com {len(df_model)} amostras.")
     return df_model
 
@@ -67,14 +100,23 @@ def prepare_for_quantum(df):
     target = df['target']
     
     # Normalização para [0, pi] - Essencial para Quantum Feature Maps
-    scaler = MinMaxScaler(feature_range=(0, np.pi))
-    X_scaled = scaler.fit_transform(features)
-    
+    # float32 é suficiente para a codificação quântica e usa metade da memória.
+    # Afim analítica (x - mn) * scale em kernel Numba, sem as duas passadas
+    # com validação do MinMaxScaler do sklearn
+    features_arr = features.to_numpy(dtype=np.float32)
+    mn = features_arr.min(axis=0)
+    scale = (np.pi / (features_arr.max(axis=0) - mn)).astype(np.float32)
+    X_scaled = affine_scale(features_arr, mn, scale)
+
+    # Persistir os parâmetros do scaler para reutilização na inferência
+    # (novas amostras devem usar os mesmos min/max do treino)
+    joblib.dump({'min': mn, 'scale': scale}, 'scaler.pkl')
+
     # One-hot encoding para o target (VQC espera 2 saídas para classificação binária)
-    y_one_hot = np.zeros((len(target), 2))
-    for i, val in enumerate(target):
-        y_one_hot[i, val] = 1
-        
+    # Lookup direto na identidade 2x2 em float32: uma única indexação, sem
+    # alocar o array de zeros nem o índice auxiliar
+    y_one_hot = np.eye(2, dtype=np.float32)[target.to_numpy(dtype=np.int8)]
+
     return X_scaled, y_one_hot
 
 if __name__ == "__main__":
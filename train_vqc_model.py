@@ -5,11 +5,13 @@ from sklearn.model_selection import train_test_split
 import os
 
 # Importações do Qiskit
+from qiskit import transpile
 from qiskit.circuit.library import ZZFeatureMap, RealAmplitudes
-from qiskit_machine_learning.algorithms import VQC
+from qiskit_machine_learning.algorithms.classifiers import NeuralNetworkClassifier
+from qiskit_machine_learning.neural_networks import SamplerQNN
 from qiskit_machine_learning.optimizers import COBYLA
 from qiskit_aer import AerSimulator
-from qiskit.utils import QuantumInstance # Necessário para compatibilidade com versões instaladas
+from qiskit_aer.primitives import Sampler as AerSampler
 
 """
 ==============================================================================
@@ -23,6 +25,11 @@ Dependências: pip install qiskit qiskit-machine-learning qiskit-aer
 ==============================================================================
 """
 
+# Simulador único do módulo: construir um AerSimulator analisa a
+# configuração JSON do backend C++, então criamos um só e o reutilizamos
+# como alvo de transpilação e referência de configuração.
+_SIM = AerSimulator(method='statevector', precision='single')
+
 # --- 1. Carregamento e Preparação dos Dados ---
 def load_and_split_data(X_file='X_quantum_ready.npy', y_file='y_quantum_ready.npy'):
     """Carrega os dados e divide em conjuntos de treino e teste."""
@@ -31,12 +38,21 @@ def load_and_split_data(X_file='X_quantum_ready.npy', y_file='y_quantum_ready.np
         print("Execute o script de pré-processamento primeiro.")
         return None, None, None, None
 
-    X = np.load(X_file)
+    # mmap_mode='r' mapeia o arquivo em vez de copiá-lo inteiro para a RAM;
+    # só as fatias de treino/teste são materializadas abaixo
+    X = np.load(X_file, mmap_mode='r')
     y = np.load(y_file)
-    
-    # Divisão dos dados (80% treino, 20% teste)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
+
+    # Divisão dos dados (80% treino, 20% teste) via índices, materializando
+    # apenas as duas fatias. Estratificar pela classe preserva a proporção
+    # da classe rara de anomalia (limiar de 2 sigma) nos dois conjuntos.
+    y_int = y.argmax(axis=1)
+    indices = np.arange(len(X))
+    idx_train, idx_test = train_test_split(
+        indices, test_size=0.2, random_state=42, stratify=y_int)
+    X_train, X_test = np.asarray(X[idx_train]), np.asarray(X[idx_test])
+    y_train, y_test = y[idx_train], y[idx_test]
+
     print(f"Dados carregados. Treino: {X_train.shape}, Teste: {X_test.shape}")
     return X_train, X_test, y_train, y_test
 
@@ -47,34 +63,71 @@ def build_vqc_model(num_qubits):
     # 2.1. Quantum Feature Map (Codificação)
     # Codifica as 4 features de entrada (SST, Umidade, Pressão, Radiação)
     # O 'reps=1' define a profundidade do circuito de codificação.
-    feature_map = ZZFeatureMap(feature_dimension=num_qubits, reps=1)
-    
+    # entanglement='linear' usa 3 rotações ZZ em vez das 6 do 'full' em
+    # 4 qubits — metade das portas de 2 qubits por avaliação; sem barreiras,
+    # o transpilador pode fundir as rotações de 1 qubit.
+    feature_map = ZZFeatureMap(feature_dimension=num_qubits, reps=1,
+                               entanglement='linear', insert_barriers=False)
+
     # 2.2. Ansatz Variacional (Circuito Treinável)
     # O 'reps=1' define a profundidade do circuito treinável.
-    ansatz = RealAmplitudes(num_qubits=num_qubits, reps=1)
+    ansatz = RealAmplitudes(num_qubits=num_qubits, reps=1,
+                            entanglement='linear', insert_barriers=False)
     
     # 2.3. Otimizador Clássico
     # COBYLA é um otimizador sem gradiente, robusto para problemas NISQ.
     optimizer = COBYLA(maxiter=50)
-    
-    # 2.4. Backend de Simulação
-    # Usamos o simulador de estado vetorial para treinamento rápido.
-    quantum_instance = QuantumInstance(AerSimulator())
-    
-    # 2.5. Construção do VQC
-    vqc = VQC(
-        feature_map=feature_map,
-        ansatz=ansatz,
+
+    # 2.4. Circuito completo e transpilação
+    # O circuito parametrizado é transpilado UMA vez aqui; a cada iteração
+    # do COBYLA apenas os parâmetros são religados. Sem isso, cada forward
+    # pass re-transpila o circuito, o que domina o tempo para 4 qubits.
+    circuit = feature_map.compose(ansatz)
+    transpiled = transpile(circuit, backend=_SIM, optimization_level=3)
+
+    # 2.5. Backend de Simulação (primitive Sampler do Aer)
+    # skip_transpilation=True para que o Sampler use o circuito já transpilado.
+    # O SamplerQNN envia todas as amostras de treino em UMA chamada batched
+    # ao Sampler por iteração do COBYLA; max_parallel_experiments=0 deixa o
+    # Aer distribuir os circuitos do batch entre os threads disponíveis.
+    # method='statevector' com precision='single': um estado de 4 qubits são
+    # só 16 amplitudes, e FP32 corta a banda de memória dos kernels pela
+    # metade sem afetar a acurácia. shots=None usa as probabilidades exatas
+    # do statevector, eliminando a etapa de amostragem por avaliação.
+    sampler = AerSampler(
+        backend_options={
+            'method': 'statevector',
+            'precision': 'single',
+            'max_parallel_threads': os.cpu_count(),
+            'max_parallel_experiments': 0,
+        },
+        run_options={'shots': None},
+        skip_transpilation=True,
+    )
+
+    # 2.6. QNN + Classificador
+    # interpret lê o último qubit (bit menos significativo) do bitstring
+    # medido para mapear cada resultado nas 2 classes.
+    qnn = SamplerQNN(
+        circuit=transpiled,
+        sampler=sampler,
+        input_params=feature_map.parameters,
+        weight_params=ansatz.parameters,
+        interpret=lambda bitstring: bitstring % 2,
+        output_shape=2,
+    )
+    vqc = NeuralNetworkClassifier(
+        neural_network=qnn,
         optimizer=optimizer,
-        quantum_instance=quantum_instance,
-        # A função de custo padrão do VQC é baseada na minimização do erro de classificação
+        one_hot=True,
+        # A função de custo padrão é baseada na minimização do erro de classificação
         # (similar à entropia cruzada, mas adaptada para probabilidades quânticas).
     )
     
     print("\nArquitetura VQC construída:")
     print(f"  - Feature Map: {feature_map.name}")
     print(f"  - Ansatz: {ansatz.name}")
-    print(f"  - Otimizador: {optimizer.__class__.__name__} (Max Iter: {optimizer.options['maxiter']})")
+    print(f"  - Otimizador: {optimizer.__class__.__name__} (Max Iter: {optimizer.settings['maxiter']})")
     
     return vqc
 